@@ -3,7 +3,8 @@ import asyncio
 
 def main():
    """Main entry point for the package."""
-   asyncio.run(server.main())
+   with asyncio.Runner(loop_factory=server.loop_factory()) as runner:
+      runner.run(server.main())
 
 # Expose important items at package level
-__all__ = ['main', 'server']
\ No newline at end of file
+__all__ = ['main', 'server']
@@ -1,43 +1,74 @@
 import asyncio
+import csv
+import functools
+import hashlib
+import io
+import itertools
 import logging
+import logging.handlers
 import os
 import time
 import platform
+import queue
+import random
+import re
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+import pyodbc
+import sqlparse
 from pyodbc import connect, Error
 from mcp.server import Server
-from mcp.types import Resource, Tool, TextContent, ImageContent, EmbeddedResource, CallToolResult
-from pydantic import AnyUrl, Field
-from typing import Optional, List, Union, Sequence
+from mcp.types import Resource, Tool, TextContent
+from pydantic import AnyUrl
+from typing import Optional, Sequence
 
 
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler()
-    ]
-)
+def _start_logging():
+    """Configure logging for the server process, unless the host application already has.
+    
+    Records are queued and written to stderr by a background thread, so log calls in the
+    handlers never block on the stream. Returns the listener to stop on shutdown, or None
+    if the root logger already had handlers.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return None
+    log_queue = queue.SimpleQueue()
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    # The queue handler merges args into msg on the logging thread, so the listener's
+    # formatter only adds the timestamp and level prefix
+    root.setLevel(logging.INFO)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, stream)
+    listener.start()
+    return listener
+
 logger = logging.getLogger("mssql_mcp_server")
 
+@functools.lru_cache(maxsize=1)
 def get_default_driver():
-    """Get the default ODBC driver name based on the platform."""
+    """Get the default ODBC driver name based on the platform.
+    
+    Cached, since the installed drivers don't change during the life of the process.
+    """
     system = platform.system().lower()
     if system == "windows":
         return "SQL Server"
     elif system == "linux":
-        # Try newer drivers first, then fall back to older versions
+        # Try newer drivers first, then fall back to older versions.
+        # Ask the driver manager what is installed rather than opening probe connections.
+        installed = set(pyodbc.drivers())
         for driver in [
             "ODBC Driver 18 for SQL Server",
             "ODBC Driver 17 for SQL Server",
             "ODBC Driver 13 for SQL Server"
         ]:
-            try:
-                with connect(f"DRIVER={{{driver}}};SERVER=;") as _:
-                    return driver
-            except:
-                continue
+            if driver in installed:
+                return driver
         return "ODBC Driver 17 for SQL Server"  # Default to 17 if no driver found
     elif system == "darwin":  # macOS
         return "ODBC Driver 17 for SQL Server"
@@ -45,7 +76,7 @@ def get_default_driver():
         return "SQL Server"  # Generic fallback
 
 # Define transient error codes that should trigger retry
-TRANSIENT_ERROR_CODES = {
+TRANSIENT_ERROR_CODES = frozenset({
     '40613',  # Database not currently available
     '40501',  # Service is busy
     '40197',  # Error processing request
@@ -55,61 +86,139 @@ TRANSIENT_ERROR_CODES = {
     '10054',  # Transport-level error
     '10060',  # Network error
     '40143',  # Connection could not be initialized
-}
+})
+
+# SQLSTATEs that mean the link dropped or timed out, even when no error number is given
+TRANSIENT_SQLSTATES = frozenset({
+    '08S01',  # Communication link failure
+    'HYT00',  # Timeout expired
+})
+
+# Matches any transient error code as it appears in a driver message, e.g. "(40613)"
+_TRANSIENT_RE = re.compile(r"\((" + "|".join(sorted(TRANSIENT_ERROR_CODES)) + r")\)")
 
 def is_transient_error(e):
     """Check if the error is transient and should be retried."""
     if not hasattr(e, 'args') or not e.args:
         return False
     
-    error_msg = str(e.args[0])
-    # Extract error code from the message
-    for code in TRANSIENT_ERROR_CODES:
-        if f"({code})" in error_msg:
-            return True
-    return False
+    # pyodbc errors carry (SQLSTATE, message); other exceptions just a message
+    if e.args[0] in TRANSIENT_SQLSTATES:
+        return True
+    return bool(_TRANSIENT_RE.search(str(e.args[-1])))
+
+def _backoff_delay(attempt, initial_delay, max_delay):
+    """Exponential backoff with full jitter, so clients throttled together don't retry together."""
+    return random.uniform(0, min(initial_delay * (2 ** attempt), max_delay))
 
 def retry_on_transient_error(max_attempts=5, initial_delay=1, max_delay=30):
     """Decorator to retry operations on transient errors with exponential backoff."""
     def decorator(func):
+        @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            delay = initial_delay
-            last_exception = None
-            
             for attempt in range(max_attempts):
                 try:
                     return func(*args, **kwargs)
                 except Exception as e:
-                    last_exception = e
                     if not is_transient_error(e) or attempt == max_attempts - 1:
                         raise
                     
-                    # Calculate delay with exponential backoff
-                    sleep_time = min(delay * (2 ** attempt), max_delay)
-                    logger.info(f"Transient error occurred, retrying in {sleep_time} seconds... (Attempt {attempt + 1}/{max_attempts})")
+                    sleep_time = _backoff_delay(attempt, initial_delay, max_delay)
+                    logger.info("Transient error occurred, retrying in %.2f seconds... (Attempt %d/%d)", sleep_time, attempt + 1, max_attempts)
                     time.sleep(sleep_time)
-            
-            raise last_exception
         return wrapper
     return decorator
 
-@retry_on_transient_error()
-def get_db_connection(connection_string):
-    """Create a database connection with retry logic."""
+def retry_on_transient_error_async(max_attempts=5, initial_delay=1, max_delay=30):
+    """Async counterpart of retry_on_transient_error that backs off without blocking the event loop."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            for attempt in range(max_attempts):
+                try:
+                    return await func(*args, **kwargs)
+                except Exception as e:
+                    if not is_transient_error(e) or attempt == max_attempts - 1:
+                        raise
+                    
+                    sleep_time = _backoff_delay(attempt, initial_delay, max_delay)
+                    logger.info("Transient error occurred, retrying in %.2f seconds... (Attempt %d/%d)", sleep_time, attempt + 1, max_attempts)
+                    await asyncio.sleep(sleep_time)
+        return wrapper
+    return decorator
+
+# The PWD value in a connection string, braced or not
+_PWD_RE = re.compile(r"(PWD=)(?:\{(?:[^}]|\}\})*\}|[^;]*)", re.IGNORECASE)
+
+def _sanitize(connection_string):
+    """Mask the password in a connection string for logging."""
+    return _PWD_RE.sub(r"\1***", connection_string)
+
+def _open_connection(connection_string):
+    """Open a single database connection, logging the sanitized connection string on failure."""
     logger.info("Attempting database connection...")
     try:
         conn = connect(connection_string)
         logger.info("Database connection successful")
         return conn
     except Exception as e:
-        logger.error(f"Connection error in get_db_connection: {str(e)}")
-        logger.error(f"Connection error type: {type(e)}")
-        logger.error(f"Connection string (sanitized): {connection_string.replace(connection_string.split('PWD=')[1].split(';')[0], '***')}")
+        logger.error("Connection error in get_db_connection: %s", e)
+        logger.error("Connection error type: %s", type(e))
+        logger.error("Connection string (sanitized): %s", _sanitize(connection_string))
         raise
 
-def get_db_config():
-    """Get database configuration from environment variables."""
-    logger.info("Getting database configuration...")
+@retry_on_transient_error()
+def get_db_connection(connection_string):
+    """Create a database connection with retry logic."""
+    return _open_connection(connection_string)
+
+@retry_on_transient_error_async()
+async def get_db_connection_async(connection_string):
+    """Create a database connection on a worker thread with retry logic."""
+    return await asyncio.to_thread(_open_connection, connection_string)
+
+@dataclass(frozen=True, slots=True)
+class DbConfig:
+    """Database settings read from the environment, with the connection string built from them."""
+    driver: str
+    server: str
+    user: str
+    password: str = field(repr=False)
+    database: str
+    connection_string: str = field(repr=False)
+    sanitized_connection_string: str
+
+# Connection string with secure defaults; only the settings vary between deployments
+CONNECTION_STRING_TEMPLATE = (
+    "Driver={{{driver}}};"
+    "Server={server};"
+    "Database={database};"
+    "UID={user};"
+    "PWD={password};"
+    "Encrypt=yes;"
+    "TrustServerCertificate={trust_server_certificate};"
+    "Connection Timeout=30;"
+    "ApplicationIntent=ReadWrite;"
+    "MultiSubnetFailover=yes;"
+    "MARS_Connection=yes;"
+    "Protocol=TCP;"
+)
+
+def get_db_config() -> DbConfig:
+    """Get database configuration from environment variables.
+    
+    The environment is only read once per process; call reset_db_config_cache() to re-read it.
+    """
+    return _build_config()
+
+def reset_db_config_cache():
+    """Forget the cached database configuration so the next call re-reads the environment."""
+    _build_config.cache_clear()
+
+@functools.lru_cache(maxsize=1)
+def _build_config():
+    """Read and validate the database configuration and build the connection string."""
+    logger.debug("Getting database configuration...")
     config = {
         "driver": os.getenv("MSSQL_DRIVER", get_default_driver()),
         "server": os.getenv("MSSQL_HOST", "localhost"),
@@ -118,11 +227,11 @@ def get_db_config():
         "database": os.getenv("MSSQL_DATABASE")
     }
     
-    logger.info(f"Configuration loaded:")
-    logger.info(f"  Driver: {config['driver']}")
-    logger.info(f"  Server: {config['server']}")
-    logger.info(f"  Database: {config['database']}")
-    logger.info(f"  User: {config['user']}")
+    logger.debug("Configuration loaded:")
+    logger.debug("  Driver: %s", config['driver'])
+    logger.debug("  Server: %s", config['server'])
+    logger.debug("  Database: %s", config['database'])
+    logger.debug("  User: %s", config['user'])
     
     # Get actual password for connection
     config["password"] = os.getenv("MSSQL_PASSWORD")
@@ -132,69 +241,458 @@ def get_db_config():
         if not config["user"]: missing.append("MSSQL_USER")
         if not config["password"]: missing.append("MSSQL_PASSWORD")
         if not config["database"]: missing.append("MSSQL_DATABASE")
-        logger.error(f"Missing required configuration: {', '.join(missing)}")
+        logger.error("Missing required configuration: %s", ', '.join(missing))
         raise ValueError("Missing required database configuration")
     
     # Get security configuration from environment
     trust_server_certificate = os.getenv("MSSQL_TRUST_SERVER_CERTIFICATE", "").lower() != "no"
-    logger.info(f"Trust server certificate: {trust_server_certificate}")
+    logger.debug("Trust server certificate: %s", trust_server_certificate)
     
     # Build connection string with secure defaults
-    connection_string = (
-        f"Driver={{{config['driver']}}};"
-        f"Server={config['server']};"
-        f"Database={config['database']};"
-        f"UID={config['user']};"
-        f"PWD={config['password']};"
-        "Encrypt=yes;"
-        f"TrustServerCertificate={'yes' if trust_server_certificate else 'no'};"
-        "Connection Timeout=30;"
-        "ApplicationIntent=ReadWrite;"
-        "MultiSubnetFailover=yes;"
-        "Protocol=TCP;"
+    connection_string = CONNECTION_STRING_TEMPLATE.format(
+        **config,
+        trust_server_certificate="yes" if trust_server_certificate else "no"
     )
     
     # Log sanitized connection string
-    logger.info(f"Connection string (sanitized): {connection_string.replace(config['password'], '***')}")
+    sanitized_connection_string = _sanitize(connection_string)
+    logger.debug("Connection string (sanitized): %s", sanitized_connection_string)
+    
+    return DbConfig(
+        **config,
+        connection_string=connection_string,
+        sanitized_connection_string=sanitized_connection_string
+    )
+
+# Keep ODBC driver-manager pooling on so discarded connections can be revived cheaply
+pyodbc.pooling = True
+
+# Process-wide pool of live connections, shared by all handlers
+POOL_SIZE = int(os.getenv("MSSQL_POOL_SIZE", "5"))
+POOL_MIN_SIZE = int(os.getenv("MSSQL_POOL_MIN_SIZE", "2"))
+_pool: Optional[asyncio.Queue] = None
+_pool_slots: Optional[asyncio.Semaphore] = None
+_pool_open = 0
+
+def _get_pool() -> asyncio.Queue:
+    """Get the queue of idle connections, creating it on first use."""
+    global _pool
+    if _pool is None:
+        _pool = asyncio.Queue()
+    return _pool
+
+def _get_pool_slots() -> asyncio.Semaphore:
+    """Get the semaphore limiting checked-out connections to MSSQL_POOL_SIZE, creating it on first use."""
+    global _pool_slots
+    if _pool_slots is None:
+        _pool_slots = asyncio.Semaphore(POOL_SIZE)
+    return _pool_slots
+
+def _close_quietly(conn):
+    """Close a connection, ignoring errors from an already broken one."""
+    try:
+        conn.close()
+    except Error:
+        pass
+
+def _discard(conn):
+    """Close a connection that won't go back to the pool."""
+    global _pool_open
+    _pool_open -= 1
+    _close_quietly(conn)
+
+def _release(conn, reuse=True):
+    """Return a connection to the pool, or close it if it mustn't be reused or the pool is already full."""
+    if not reuse or _pool_open > POOL_SIZE:
+        _discard(conn)
+    else:
+        _get_pool().put_nowait(conn)
+
+async def _in_thread(func, *args):
+    """Run func on a worker thread, like asyncio.to_thread, but finish it even if cancelled.
+    
+    Cancelling the await can't stop the thread, so the cancellation is only passed on once
+    the thread is done; otherwise its connection could be rolled back or pooled while in use.
+    """
+    task = asyncio.ensure_future(asyncio.to_thread(func, *args))
+    try:
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        while not task.done():
+            try:
+                await asyncio.wait([task])
+            except asyncio.CancelledError:
+                pass
+        raise
+
+@asynccontextmanager
+async def acquire_conn(autocommit=False, reuse=True):
+    """Check a connection out of the pool, opening a new one if none is idle.
+    
+    At most MSSQL_POOL_SIZE connections are checked out at once; further callers wait
+    for a slot, which is freed whether the connection is returned or discarded.
+    Mirrors pyodbc's own context manager: commits on success and rolls back on error.
+    Read-only callers pass autocommit=True to skip the implicit transaction and the commit round trip.
+    Connecting, committing and rolling back run on worker threads so the event loop stays free.
+    Callers should run their own work on the connection through _in_thread(), so a cancelled
+    request doesn't release the connection while a thread is still using it.
+    Connections that raised a database error are closed instead of being returned, as are
+    those checked out with reuse=False because the caller may have changed session state.
+    """
+    global _pool_open
+    pool = _get_pool()
+    slots = _get_pool_slots()
+    await slots.acquire()
+    try:
+        try:
+            conn = pool.get_nowait()
+        except asyncio.QueueEmpty:
+            _pool_open += 1
+            try:
+                conn = await get_db_connection_async(get_db_config().connection_string)
+            except BaseException:
+                _pool_open -= 1
+                raise
+        
+        try:
+            if conn.autocommit != autocommit:
+                conn.autocommit = autocommit
+            yield conn
+            if not autocommit:
+                await _in_thread(conn.commit)
+        except Error:
+            # The connection may be broken; don't hand it to the next caller
+            _discard(conn)
+            raise
+        except BaseException:
+            try:
+                if not autocommit:
+                    await _in_thread(conn.rollback)
+            except Error:
+                _discard(conn)
+                raise
+            _release(conn, reuse)
+            raise
+        _release(conn, reuse)
+    finally:
+        slots.release()
+
+async def warm_pool(size=POOL_MIN_SIZE):
+    """Open up to size connections concurrently so the first requests don't wait for a login.
+    
+    Each connection is tried once, without retries; failures are logged and left for
+    acquire_conn() to retry on demand.
+    """
+    global _pool_open
+    count = max(0, min(size, POOL_SIZE) - _pool_open)
+    if not count:
+        return
+    _pool_open += count
+    connection_string = get_db_config().connection_string
+    results = await asyncio.gather(
+        *(asyncio.to_thread(_open_connection, connection_string) for _ in range(count)),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            _pool_open -= 1
+            logger.warning("Could not pre-open pooled connection: %s", result)
+        else:
+            _release(result)
+
+def close_pool():
+    """Close all idle pooled connections."""
+    pool = _get_pool()
+    while not pool.empty():
+        _discard(pool.get_nowait())
+
+# Column names per table per (server, database), with the time they were fetched
+SCHEMA_TTL = float(os.getenv("MSSQL_SCHEMA_TTL", "30"))
+_SCHEMA_CACHE: dict[tuple[str, str], tuple[float, dict[tuple[str, str], list[str]]]] = {}
+
+# Tables and their columns in one round trip, in column order
+_SCHEMA_QUERY = """
+SELECT t.TABLE_SCHEMA, t.TABLE_NAME, c.COLUMN_NAME
+FROM INFORMATION_SCHEMA.TABLES t
+JOIN INFORMATION_SCHEMA.COLUMNS c
+    ON c.TABLE_SCHEMA = t.TABLE_SCHEMA AND c.TABLE_NAME = t.TABLE_NAME
+WHERE t.TABLE_TYPE = 'BASE TABLE'
+ORDER BY t.TABLE_SCHEMA, t.TABLE_NAME, c.ORDINAL_POSITION
+"""
+
+# Rows returned when reading a table resource
+READ_ROW_LIMIT = 100
+
+# Words that decide whether a batch can add, remove or rename tables
+_SCHEMA_WORD_RE = re.compile(r"\b(?:CREATE|DROP|ALTER|SP_RENAME|SELECT|INSERT|MERGE|INTO)\b", re.IGNORECASE)
+
+def _changes_schema(sql):
+    """Check whether a statement or batch can add, remove or rename tables.
+    
+    CREATE, DROP, ALTER and sp_rename always count. INTO only counts after a SELECT,
+    since SELECT ... INTO creates a table while INSERT INTO and MERGE INTO don't.
+    One linear pass over the words, so a large batch can't make it backtrack.
+    """
+    last = None
+    for match in _SCHEMA_WORD_RE.finditer(sql):
+        word = match.group().upper()
+        if word == "INTO":
+            if last == "SELECT":
+                return True
+        elif word in ("SELECT", "INSERT", "MERGE"):
+            last = word
+        else:
+            return True
+    return False
+
+# Words that can leave state on the session: switching database, SET options, EXECUTE AS
+_SESSION_WORD_RE = re.compile(r"\b(?:USE|SET|EXEC|EXECUTE|REVERT)\b", re.IGNORECASE)
+
+def _is_plain_select(sql):
+    """Check whether a query is a SELECT that leaves no session state behind.
+    
+    Anything else, such as USE, SET ROWCOUNT, EXECUTE AS or SELECT ... INTO #temp, would
+    carry over to the next caller of a pooled connection. A false positive only costs a
+    fresh connection.
+    """
+    return (
+        _first_keyword(sql)[0] == "SELECT"
+        and not _SESSION_WORD_RE.search(sql)
+        and not _changes_schema(sql)
+    )
+
+def _get_schema(cursor, config):
+    """Map each base table, as (schema, table), to its columns, served from a short-lived cache.
+    
+    Keying by schema keeps same-named tables in different schemas apart.
+    """
+    key = (config.server, config.database)
+    cached = _SCHEMA_CACHE.get(key)
+    now = time.monotonic()
+    if cached and now - cached[0] < SCHEMA_TTL:
+        return cached[1]
+    
+    cursor.execute(_SCHEMA_QUERY)
+    schema: dict[tuple[str, str], list[str]] = {}
+    for table_schema, table, column in cursor.fetchall():
+        schema.setdefault((table_schema, table), []).append(column)
+    _SCHEMA_CACHE[key] = (now, schema)
+    return schema
+
+def _get_tables(cursor, config):
+    """List base tables in the configured database as schema.table names."""
+    return [f"{table_schema}.{table}" for table_schema, table in _get_schema(cursor, config)]
+
+def _invalidate_tables(config):
+    """Drop the cached schema for the configured database."""
+    _SCHEMA_CACHE.pop((config.server, config.database), None)
+
+# Rows handed to the csv writer per call, and the size at which a result is split into another chunk
+CSV_BATCH_ROWS = 1000
+RESULT_CHUNK_SIZE = 1 << 20
+
+def _drain(buf, last=False):
+    """Return the buffered CSV text and empty the buffer.
+    
+    For the last chunk the final newline is truncated in place first, so the text is
+    copied out of the buffer only once.
+    """
+    if last:
+        buf.seek(buf.tell() - 1)
+        buf.truncate()
+    text = buf.getvalue()
+    buf.seek(0)
+    buf.truncate()
+    return text
+
+def _csv_chunks(cursor, chunk_size=RESULT_CHUNK_SIZE):
+    """Serialise the cursor's current result set as CSV, yielding text chunks of about chunk_size.
     
-    return config, connection_string
+    The header leads the first chunk and every chunk ends on a row boundary. Every chunk
+    but the last keeps its trailing newline, so concatenating the chunks gives the whole
+    CSV. Values containing commas, quotes or newlines are quoted and NULLs are written
+    as empty fields.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow([desc[0] for desc in cursor.description])
+    rows = iter(cursor)
+    # A full chunk is held back until more rows arrive, since only the last one is trimmed
+    pending = None
+    while True:
+        # The C csv writer pulls each batch straight from the cursor
+        before = buf.tell()
+        writer.writerows(itertools.islice(rows, CSV_BATCH_ROWS))
+        if buf.tell() == before:
+            break
+        if buf.tell() >= chunk_size:
+            if pending is not None:
+                yield pending
+            pending = _drain(buf)
+    if buf.tell():
+        if pending is not None:
+            yield pending
+        yield _drain(buf, last=True)
+    elif pending is not None:
+        yield pending[:-1]
+
+def _rows_to_csv(cursor):
+    """Serialise the cursor's current result set as a single CSV string, header first."""
+    return "".join(_csv_chunks(cursor))
+
+# Permission-denied wording in error text, and the SQL Server error numbers that mean it
+_PERM_RE = re.compile(r"permission|privilege|access denied|not authorized", re.IGNORECASE)
+_PERM_CODE_RE = re.compile(r"\b(?:229|230|262|297|378)\b")
+
+# Opt-in cache of SELECT results, keyed by the normalised query text
+QUERY_CACHE_ENABLED = os.getenv("MSSQL_QUERY_CACHE", "") == "1"
+QUERY_CACHE_TTL = float(os.getenv("MSSQL_QUERY_TTL", "30"))
+QUERY_CACHE_SIZE = int(os.getenv("MSSQL_QUERY_CACHE_SIZE", "128"))
+_RESULT_CACHE: OrderedDict[bytes, tuple[float, list[str]]] = OrderedDict()
+# Tool calls run on worker threads, so LRU bookkeeping needs a lock
+_RESULT_CACHE_LOCK = threading.Lock()
+
+def _result_key(query, config):
+    """Hash the query with comments stripped and keywords uppercased, scoped to the database."""
+    normalized = sqlparse.format(query, strip_comments=True, keyword_case="upper").strip()
+    key = f"{config.server}\0{config.database}\0{normalized}"
+    return hashlib.blake2b(key.encode(), digest_size=16).digest()
+
+def _get_cached_result(key):
+    """Return the cached result chunks for a query, or None if missing or expired."""
+    with _RESULT_CACHE_LOCK:
+        entry = _RESULT_CACHE.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] >= QUERY_CACHE_TTL:
+            del _RESULT_CACHE[key]
+            return None
+        _RESULT_CACHE.move_to_end(key)
+        return entry[1]
+
+def _store_result(key, chunks):
+    """Cache a query's result chunks, evicting the least recently used entries."""
+    with _RESULT_CACHE_LOCK:
+        _RESULT_CACHE[key] = (time.monotonic(), chunks)
+        _RESULT_CACHE.move_to_end(key)
+        while len(_RESULT_CACHE) > QUERY_CACHE_SIZE:
+            _RESULT_CACHE.popitem(last=False)
+
+def _clear_results():
+    """Forget all cached results; any write may have changed them."""
+    with _RESULT_CACHE_LOCK:
+        _RESULT_CACHE.clear()
+
+# Whitespace, comments and stray semicolons before a keyword, then the keyword itself
+_KEYWORD_RE = re.compile(r"(?:\s+|--[^\n]*|/\*.*?\*/|;)*(\w*)", re.DOTALL)
+
+def _first_keyword(sql, pos=0):
+    """Return the first keyword at or after pos, uppercased, and the index just past it.
+    
+    Only the keyword itself is uppercased, so classifying a large query doesn't copy it.
+    """
+    match = _KEYWORD_RE.match(sql, pos)
+    return match.group(1).upper(), match.end()
+
+# The rest of a BEGIN TRAN statement ended by a semicolon: an optional name, then WITH MARK
+_BEGIN_TAIL_RE = re.compile(
+    r"\s*(?:(?:@\w+|\[(?:[^\]]|\]\])*\]|\w+)\s*)?(?:WITH\s+MARK\s*(?:N?'(?:[^']|'')*'\s*)?)?;",
+    re.IGNORECASE
+)
+
+@functools.lru_cache(maxsize=256)
+def _split_statements(sql):
+    """Split a batch into (keyword, statement) pairs, cached per query text.
+    
+    sqlparse keeps semicolons inside string literals and comments from splitting a
+    statement. A leading BEGIN TRAN[SACTION] is removed, since the caller manages the
+    transaction, and comment-only fragments are dropped.
+    """
+    keyword, pos = _first_keyword(sql)
+    if keyword == "BEGIN":
+        next_keyword, next_pos = _first_keyword(sql, pos)
+        if next_keyword in ("TRAN", "TRANSACTION"):
+            # Strip it before splitting: sqlparse reads BEGIN as opening a block and
+            # would otherwise keep the whole batch, COMMIT included, in one fragment.
+            # A transaction name or WITH MARK up to the semicolon goes with it.
+            tail = _BEGIN_TAIL_RE.match(sql, next_pos)
+            sql = sql[tail.end() if tail else next_pos:]
+    statements = []
+    for stmt in sqlparse.split(sql):
+        keyword, _ = _first_keyword(stmt)
+        if keyword:
+            statements.append((keyword, stmt))
+    return tuple(statements)
+
+def _is_single_statement(sql):
+    """Check whether a batch holds exactly one statement.
+    
+    Bypasses _split_statements' cache, so large ad hoc queries aren't kept alive by it.
+    """
+    return len(_split_statements.__wrapped__(sql)) == 1
+
+def _do_list_tables(conn, config):
+    """List tables on a pooled connection; runs on a worker thread."""
+    with conn.cursor() as cursor:
+        return _get_tables(cursor, config)
+
+def _quote_ident(name):
+    """Quote an identifier for T-SQL, escaping any closing brackets."""
+    return "[" + name.replace("]", "]]") + "]"
+
+def _do_read_table(conn, table, config):
+    """Read a table's rows as CSV on a pooled connection; runs on a worker thread.
+    
+    The table is named schema.table, as listed by _get_tables().
+    """
+    with conn.cursor() as cursor:
+        # Only read tables that actually exist, so the URI can't inject SQL
+        table_schema, _, table_name = table.partition(".")
+        columns = _get_schema(cursor, config).get((table_schema, table_name))
+        if columns is None:
+            raise ValueError(f"Unknown table: {table}")
+        select_list = ", ".join(_quote_ident(column) for column in columns)
+        source = f"{_quote_ident(table_schema)}.{_quote_ident(table_name)}"
+        cursor.execute(f"SELECT TOP (?) {select_list} FROM {source}", READ_ROW_LIMIT)
+        return _rows_to_csv(cursor)
 
 # Initialize server
 app = Server("mssql_mcp_server")
 
+# Resource entries already built, by table name
+_RESOURCE_CACHE: dict[str, Resource] = {}
+
+def _table_resource(table):
+    """Get the Resource describing a table, building it on first use."""
+    resource = _RESOURCE_CACHE.get(table)
+    if resource is None:
+        resource = _RESOURCE_CACHE[table] = Resource(
+            uri=f"mssql://{table}/data",
+            name=f"Table: {table}",
+            mimeType="text/plain",
+            description=f"Data in table: {table}"
+        )
+    return resource
+
 @app.list_resources()
 async def list_resources() -> list[Resource]:
     """List MSSQL tables as resources."""
-    config, connection_string = get_db_config()
     try:
-        with connect(connection_string) as conn:
-            with conn.cursor() as cursor:
-                # Use INFORMATION_SCHEMA to list tables in MSSQL
-                cursor.execute("SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_TYPE = 'BASE TABLE';")
-                tables = cursor.fetchall()
-                logger.info(f"Found tables: {tables}")
-                
-                resources = []
-                for table in tables:
-                    resources.append(
-                        Resource(
-                            uri=f"mssql://{table[0]}/data",
-                            name=f"Table: {table[0]}",
-                            mimeType="text/plain",
-                            description=f"Data in table: {table[0]}"
-                        )
-                    )
-                return resources
+        config = get_db_config()
+        async with acquire_conn(autocommit=True) as conn:
+            tables = await _in_thread(_do_list_tables, conn, config)
+            logger.debug("Found %d tables", len(tables))
+            
+            return [_table_resource(table) for table in tables]
     except Error as e:
-        logger.error(f"Failed to list resources: {str(e)}")
+        logger.error("Failed to list resources: %s", e)
         return []
 
 @app.read_resource()
 async def read_resource(uri: AnyUrl) -> str:
     """Read table contents."""
-    config, connection_string = get_db_config()
     uri_str = str(uri)
-    logger.info(f"Reading resource: {uri_str}")
+    logger.debug("Reading resource: %s", uri_str)
     
     if not uri_str.startswith("mssql://"):
         raise ValueError(f"Invalid URI scheme: {uri_str}")
@@ -203,51 +701,189 @@ async def read_resource(uri: AnyUrl) -> str:
     table = parts[0]
     
     try:
-        with connect(connection_string) as conn:
-            with conn.cursor() as cursor:
-                cursor.execute(f"SELECT * FROM {table} LIMIT 100")
-                columns = [desc[0] for desc in cursor.description]
-                rows = cursor.fetchall()
-                result = [",".join(map(str, row)) for row in rows]
-                return "\n".join([",".join(columns)] + result)
+        config = get_db_config()
+        async with acquire_conn(autocommit=True) as conn:
+            return await _in_thread(_do_read_table, conn, table, config)
                 
     except Error as e:
-        logger.error(f"Database error reading resource {uri}: {str(e)}")
+        logger.error("Database error reading resource %s: %s", uri, e)
         raise RuntimeError(f"Database error: {str(e)}")
 
+# Tool definitions never change, so build and validate them once
+TOOLS = [
+    Tool(
+        name="execute_sql",
+        description="Execute an SQL query on the MSSQL server",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "The SQL query to execute"
+                }
+            },
+            "required": ["query"]
+        }
+    ),
+    Tool(
+        name="list_tables",
+        description="List all tables in the current database",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+        }
+    )
+]
+
 @app.list_tools()
 async def list_tools() -> list[Tool]:
     """List available MSSQL tools."""
     logger.info("Listing tools...")
-    return [
-        Tool(
-            name="execute_sql",
-            description="Execute an SQL query on the MSSQL server",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "The SQL query to execute"
-                    }
-                },
-                "required": ["query"]
-            }
-        ),
-        Tool(
-            name="list_tables",
-            description="List all tables in the current database",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-            }
-        )
-    ]
+    return TOOLS
+
+def _run_tool(conn, name, arguments, config):
+    """Run a validated tool call on a pooled connection; runs on a worker thread."""
+    with conn.cursor() as cursor:
+        if name == "list_tables":
+            logger.debug("Executing list_tables query...")
+            try:
+                tables = _get_tables(cursor, config)
+                logger.debug("Found %d tables", len(tables))
+                result = [f"Tables_in_{config.database}"]
+                result.extend(tables)
+                return [TextContent(
+                    type="text",
+                    text="\n".join(result)
+                )]
+            except Exception as e:
+                logger.error("Error in list_tables: %s", e)
+                logger.error("Error type: %s", type(e))
+                return [TextContent(
+                    type="text",
+                    text=f"Error listing tables: {str(e)}"
+                )]
+
+        elif name == "execute_sql":
+            query = arguments["query"]
+            logger.debug("Executing SQL query: %s", query)
+
+            # Classify the statement by its leading keywords, skipping comments
+            keyword, pos = _first_keyword(query)
+
+            try:
+                # For transaction queries, we need to check if there were any errors
+                if keyword == "BEGIN" and _first_keyword(query, pos)[0] in ("TRAN", "TRANSACTION"):
+                    _clear_results()
+                    try:
+                        # Execute each statement in the transaction separately
+                        for stmt_keyword, stmt in _split_statements(query):
+                            if stmt_keyword == "COMMIT":
+                                conn.commit()
+                                continue
+                            cursor.execute(stmt)
+                            if _changes_schema(stmt):
+                                _invalidate_tables(config)
+                            # Step past any further result sets; errors from later
+                            # statements in the batch are raised here
+                            while cursor.nextset():
+                                pass
+
+                        # If we got here, all statements succeeded
+                        return [TextContent(
+                            type="text",
+                            text="Transaction completed successfully"
+                        )]
+                    except Error as e:
+                        conn.rollback()
+                        return [TextContent(
+                            type="text",
+                            text=f"Transaction error: {str(e)}"
+                        )]
+
+                changes_schema = _changes_schema(query)
+                is_read = keyword == "SELECT" and not changes_schema
+                # Serve repeated read-only queries from the opt-in result cache
+                result_key = None
+                if is_read and QUERY_CACHE_ENABLED:
+                    # Only a lone SELECT counts, since a batch like "SELECT ...; UPDATE ..."
+                    # has to run every time and may change cached results
+                    is_read = _is_single_statement(query)
+                    if is_read:
+                        result_key = _result_key(query, config)
+                        cached = _get_cached_result(result_key)
+                        if cached is not None:
+                            return [TextContent(type="text", text=chunk) for chunk in cached]
+                
+                # Execute the query
+                cursor.execute(query)
+                if changes_schema:
+                    _invalidate_tables(config)
+                if not is_read:
+                    _clear_results()
+
+                # Check for permission errors in cursor messages
+                if cursor.messages:
+                    for message in cursor.messages:
+                        msg_str = str(message)
+                        if _PERM_CODE_RE.search(msg_str):
+                            return [TextContent(
+                                type="text",
+                                text=f"Permission denied: {msg_str}"
+                            )]
+
+                # Regular SELECT queries
+                if keyword == "SELECT":
+                    # Large results go back as several row-aligned chunks rather than one huge string
+                    chunks = list(_csv_chunks(cursor))
+                    logger.debug("SELECT completed cols=%d chunks=%d", len(cursor.description), len(chunks))
+                    if result_key is not None:
+                        _store_result(result_key, chunks)
+
+                    return [TextContent(type="text", text=chunk) for chunk in chunks]
+
+                # Non-SELECT queries
+                else:
+                    rowcount = cursor.rowcount
+                    # Run the rest of a multi-statement batch so its errors surface before committing
+                    while cursor.nextset():
+                        pass
+                    conn.commit()
+                    result_text = f"Query executed successfully. Rows affected: {rowcount}"
+                    logger.debug("Query result: %s", result_text)
+
+                    return [TextContent(
+                        type="text",
+                        text=result_text
+                    )]
+            except Error as e:
+                # SQL-specific errors
+                error_msg = str(e)
+
+                # Check for permission errors in both error message and cursor messages
+                is_permission_error = bool(
+                    _PERM_RE.search(error_msg) or
+                    (cursor.messages and any(
+                        _PERM_RE.search(str(msg)) for msg in cursor.messages
+                    ))
+                )
+
+                if is_permission_error:
+                    return [TextContent(
+                        type="text",
+                        text=f"Permission denied: {error_msg}"
+                    )]
+
+                return [TextContent(
+                    type="text",
+                    text=f"Error: {error_msg}"
+                )]
 
 @app.call_tool()
 async def call_tool(name: str, arguments: dict) -> Sequence[TextContent]:
     """Execute SQL commands."""
-    logger.info(f"Calling tool: {name} with arguments: {arguments}")
+    # The arguments can hold a large query, so only log them when debugging
+    logger.info("Calling tool: %s", name)
+    logger.debug("Tool arguments: %s", arguments)
     
     # Validate tool name
     if name not in ["execute_sql", "list_tables"]:
@@ -265,180 +901,70 @@ async def call_tool(name: str, arguments: dict) -> Sequence[TextContent]:
     
     # Get database configuration and attempt connection
     try:
-        logger.info("Getting database configuration for tool execution...")
-        config, connection_string = get_db_config()
+        logger.debug("Getting database configuration for tool execution...")
+        config = get_db_config()
         
-        logger.info("Attempting to establish database connection...")
-        with get_db_connection(connection_string) as conn:
-            logger.info("Database connection established successfully")
-            with conn.cursor() as cursor:
-                if name == "list_tables":
-                    logger.info("Executing list_tables query...")
-                    try:
-                        cursor.execute("SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_TYPE = 'BASE TABLE';")
-                        tables = cursor.fetchall()
-                        logger.info(f"Found {len(tables)} tables")
-                        result = [f"Tables_in_{config['database']}"]
-                        result.extend([table[0] for table in tables])
-                        return [TextContent(
-                            type="text",
-                            text="\n".join(result)
-                        )]
-                    except Exception as e:
-                        logger.error(f"Error in list_tables: {str(e)}")
-                        logger.error(f"Error type: {type(e)}")
-                        return [TextContent(
-                            type="text",
-                            text=f"Error listing tables: {str(e)}"
-                        )]
-                
-                elif name == "execute_sql":
-                    query = arguments["query"]
-                    logger.info(f"Executing SQL query: {query}")
-                    
-                    # Remove comments and whitespace for command detection
-                    cleaned_query = "\n".join(
-                        line for line in query.splitlines()
-                        if not line.strip().startswith('--')
-                    ).strip()
-                    
-                    try:
-                        # For transaction queries, we need to check if there were any errors
-                        if "BEGIN TRANSACTION" in cleaned_query.upper():
-                            try:
-                                # Execute each statement in the transaction separately
-                                statements = [s.strip() for s in cleaned_query.split(';') if s.strip()]
-                                for stmt in statements:
-                                    if stmt.upper().startswith('BEGIN TRANSACTION'):
-                                        continue
-                                    if stmt.upper().startswith('COMMIT'):
-                                        conn.commit()
-                                        continue
-                                    cursor.execute(stmt)
-                                    # Try to fetch results to detect errors
-                                    try:
-                                        cursor.fetchall()
-                                    except:
-                                        pass  # Ignore fetch errors for non-SELECT statements
-                                
-                                # If we got here, all statements succeeded
-                                return [TextContent(
-                                    type="text",
-                                    text="Transaction completed successfully"
-                                )]
-                            except Error as e:
-                                conn.rollback()
-                                return [TextContent(
-                                    type="text",
-                                    text=f"Transaction error: {str(e)}"
-                                )]
-                        
-                        # Execute the query
-                        cursor.execute(query)
-                        
-                        # Check for permission errors in cursor messages
-                        if cursor.messages:
-                            for message in cursor.messages:
-                                msg_str = str(message)
-                                if any(code in msg_str for code in ['229', '230', '262', '297', '378']):
-                                    return [TextContent(
-                                        type="text",
-                                        text=f"Permission denied: {msg_str}"
-                                    )]
-                        
-                        # Regular SELECT queries
-                        if cleaned_query.strip().upper().startswith("SELECT"):
-                            logger.info("Processing SELECT query results...")
-                            
-                            # Get column info
-                            columns = [desc[0] for desc in cursor.description]
-                            logger.info(f"Query columns: {columns}")
-                            
-                            # Fetch rows
-                            rows = cursor.fetchall()
-                            logger.info(f"Raw query results: {rows}")
-                            
-                            # Process rows
-                            result = []
-                            for row in rows:
-                                row_str = ",".join(map(str, row))
-                                logger.info(f"Processing row: {row_str}")
-                                result.append(row_str)
-                            
-                            # Build final text
-                            header = ",".join(columns)
-                            logger.info(f"Header: {header}")
-                            result_text = "\n".join([header] + result)
-                            logger.info(f"Final result text: {result_text}")
-                            
-                            return [TextContent(
-                                type="text",
-                                text=result_text
-                            )]
-                        
-                        # Non-SELECT queries
-                        else:
-                            conn.commit()
-                            result_text = f"Query executed successfully. Rows affected: {cursor.rowcount}"
-                            logger.info(f"Query result: {result_text}")
-                            
-                            return [TextContent(
-                                type="text",
-                                text=result_text
-                            )]
-                    except Error as e:
-                        # SQL-specific errors
-                        error_msg = str(e)
-                        
-                        # Check for permission errors in both error message and cursor messages
-                        is_permission_error = (
-                            any(err in error_msg.lower() for err in 
-                                ["permission", "privilege", "access denied", "not authorized"]) or
-                            (cursor.messages and any(
-                                any(err in str(msg).lower() for err in 
-                                    ["permission", "privilege", "access denied", "not authorized"])
-                                for msg in cursor.messages
-                            ))
-                        )
-                        
-                        if is_permission_error:
-                            return [TextContent(
-                                type="text",
-                                text=f"Permission denied: {error_msg}"
-                            )]
-                        
-                        return [TextContent(
-                            type="text",
-                            text=f"Error: {error_msg}"
-                        )]
-                    
+        logger.debug("Attempting to establish database connection...")
+        # list_tables only reads, so it can skip the transaction. Only connections that ran
+        # list_tables or a plain SELECT go back to the pool, since anything else may have
+        # changed the database or session settings for the next caller.
+        reuse = name == "list_tables" or _is_plain_select(arguments["query"])
+        async with acquire_conn(autocommit=name == "list_tables", reuse=reuse) as conn:
+            logger.debug("Database connection established successfully")
+            return await _in_thread(_run_tool, conn, name, arguments, config)
+    
     except Exception as e:
-        logger.error(f"Error executing tool '{name}': {str(e)}")
-        logger.error(f"Error type: {type(e)}")
-        logger.error(f"Error location: {e.__traceback__.tb_frame.f_code.co_filename}:{e.__traceback__.tb_lineno}")
+        logger.error("Error executing tool '%s': %s", name, e)
+        logger.error("Error type: %s", type(e))
+        logger.error("Error location: %s:%s", e.__traceback__.tb_frame.f_code.co_filename, e.__traceback__.tb_lineno)
         return [TextContent(
             type="text",
             text=f"Error: {str(e)}"
         )]
 
+def loop_factory():
+    """Return uvloop's event loop factory when it is installed, else None for asyncio's default."""
+    try:
+        import uvloop
+    except ImportError:
+        return None
+    return uvloop.new_event_loop
+
 async def main():
     """Main entry point to run the MCP server."""
     from mcp.server.stdio import stdio_server
     
-    logger.info("Starting MSSQL MCP server...")
-    config, _ = get_db_config()
-    logger.info(f"Database config: {config['server']}/{config['database']} as {config['user']}")
-    
-    async with stdio_server() as (read_stream, write_stream):
+    listener = _start_logging()
+    try:
+        logger.info("Starting MSSQL MCP server...")
+        # Validate the configuration once, before serving, so a bad deployment fails fast
         try:
-            await app.run(
-                read_stream,
-                write_stream,
-                app.create_initialization_options()
-            )
-        except Exception as e:
-            logger.error(f"Server error: {str(e)}", exc_info=True)
-            raise
+            config = get_db_config()
+        except ValueError as e:
+            logger.error("Invalid configuration: %s", e)
+            raise SystemExit(1)
+        logger.info("Database config: %s/%s as %s", config.server, config.database, config.user)
+    
+        async with stdio_server() as (read_stream, write_stream):
+            # Warm the pool alongside the handshake, so a slow database doesn't hold up initialization
+            warm_task = asyncio.create_task(warm_pool())
+            try:
+                await app.run(
+                    read_stream,
+                    write_stream,
+                    app.create_initialization_options()
+                )
+            except Exception as e:
+                logger.error("Server error: %s", e, exc_info=True)
+                raise
+            finally:
+                warm_task.cancel()
+                close_pool()
+    finally:
+        # Flush anything still queued before the process exits
+        if listener is not None:
+            listener.stop()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    with asyncio.Runner(loop_factory=loop_factory()) as runner:
+        runner.run(main())
\ No newline at end of file
@@ -0,0 +1,12 @@
+import pytest
+from mssql_mcp_server.server import close_pool
+
+@pytest.fixture(scope="session", autouse=True)
+def shared_pool():
+    """Share the server's pooled connections across the whole test session.
+    
+    All tests run on one session-scoped event loop (see pytest.ini), so connections
+    opened by one test are reused by the next instead of logging in again.
+    """
+    yield
+    close_pool()
@@ -1,45 +1,288 @@
+import asyncio
+import functools
 import pytest
 import os
-from mssql_mcp_server.server import app, list_tools, list_resources, read_resource, call_tool
+import re
+import threading
+from mssql_mcp_server.server import app, list_tools, list_resources, read_resource, call_tool, close_pool, reset_db_config_cache
+from mssql_mcp_server.server import _rows_to_csv, _csv_chunks, _quote_ident, _first_keyword, _split_statements, _changes_schema, _get_schema, _get_tables, is_transient_error
+from mssql_mcp_server.server import DbConfig, _result_key, _sanitize, _in_thread, _is_plain_select, acquire_conn
+from pyodbc import Error
 from pydantic import AnyUrl
 
 def test_server_initialization():
     """Test that the server initializes correctly."""
     assert app.name == "mssql_mcp_server"
 
-@pytest.mark.asyncio
 async def test_list_tools():
     """Test that list_tools returns expected tools."""
-    tools = await list_tools()
+    tools_by_name = {tool.name: tool for tool in await list_tools()}
     # Verify execute_sql tool
-    execute_sql = next((t for t in tools if t.name == "execute_sql"), None)
+    execute_sql = tools_by_name.get("execute_sql")
     assert execute_sql is not None
     assert execute_sql.description == "Execute an SQL query on the MSSQL server"
     assert "query" in execute_sql.inputSchema["properties"]
     assert execute_sql.inputSchema["required"] == ["query"]
 
     # Verify list_tables tool
-    list_tables = next((t for t in tools if t.name == "list_tables"), None)
+    list_tables = tools_by_name.get("list_tables")
     assert list_tables is not None
     assert list_tables.description == "List all tables in the current database"
     assert list_tables.inputSchema["properties"] == {}
 
-@pytest.mark.asyncio
 async def test_call_tool_invalid_name():
     """Test calling a tool with an invalid name."""
     result = await call_tool("invalid_tool", {})
     assert len(result) == 1
     assert "Unknown tool" in result[0].text
 
-@pytest.mark.asyncio
 async def test_call_tool_missing_query():
     """Test calling execute_sql without a query."""
     result = await call_tool("execute_sql", {})
     assert len(result) == 1
     assert "Query is required" in result[0].text
 
+class FakeCursor:
+    """Minimal stand-in for a pyodbc cursor over an in-memory result set."""
+    def __init__(self, columns, rows):
+        self.description = [(column,) for column in columns]
+        self._rows = list(rows)
+
+    def __iter__(self):
+        return iter(self._rows)
+
+def test_rows_to_csv():
+    """Test CSV serialisation of a result set, including quoting and NULLs."""
+    cursor = FakeCursor(["id", "name"], [(1, "plain"), (2, "a,b"), (3, None)])
+    assert _rows_to_csv(cursor) == 'id,name\n1,plain\n2,"a,b"\n3,'
+
+def test_rows_to_csv_empty_result():
+    """Test that an empty result set serialises to just the header."""
+    assert _rows_to_csv(FakeCursor(["id"], [])) == "id"
+
+def test_csv_chunks_split_on_row_boundaries(monkeypatch):
+    """Test that large results are split into row-aligned chunks with the header first."""
+    monkeypatch.setattr("mssql_mcp_server.server.CSV_BATCH_ROWS", 2)
+    rows = [(i, "x" * 10) for i in range(10)]
+    chunks = list(_csv_chunks(FakeCursor(["id", "val"], rows), chunk_size=40))
+    assert len(chunks) > 1
+    assert chunks[0].startswith("id,val\n")
+    assert all(chunk.endswith("\n") for chunk in chunks[:-1])
+    assert not chunks[-1].endswith("\n")
+    assert "".join(chunks) == _rows_to_csv(FakeCursor(["id", "val"], rows))
+
+def test_quote_ident():
+    """Test that identifiers are bracket-quoted with closing brackets escaped."""
+    assert _quote_ident("users") == "[users]"
+    assert _quote_ident("odd]name") == "[odd]]name]"
+
+def test_first_keyword():
+    """Test statement classification skips whitespace and comments."""
+    assert _first_keyword("  select 1")[0] == "SELECT"
+    assert _first_keyword("-- note\n/* block\ncomment */ Insert INTO t")[0] == "INSERT"
+    keyword, pos = _first_keyword("BEGIN TRANSACTION; INSERT INTO t VALUES (1)")
+    assert keyword == "BEGIN"
+    assert _first_keyword("BEGIN TRANSACTION; INSERT INTO t VALUES (1)", pos)[0] == "TRANSACTION"
+    assert _first_keyword("-- only a comment")[0] == ""
+
+def test_split_statements():
+    """Test batch splitting keeps quoted semicolons and drops the BEGIN TRANSACTION."""
+    statements = _split_statements(
+        "BEGIN TRANSACTION;\n"
+        "INSERT INTO t (s) VALUES ('a;b'); -- trailing note\n"
+        "COMMIT;"
+    )
+    assert [keyword for keyword, _ in statements] == ["INSERT", "COMMIT"]
+    assert "'a;b'" in statements[0][1]
+
+@pytest.mark.parametrize("batch", [
+    "BEGIN TRAN; INSERT INTO t VALUES (1); INSERT INTO t VALUES (1); COMMIT;",
+    "begin tran;\nINSERT INTO t VALUES (1);\nINSERT INTO t VALUES (1);\nCOMMIT TRAN;",
+    "BEGIN TRANSACTION t1; INSERT INTO t VALUES (1); INSERT INTO t VALUES (1); COMMIT TRANSACTION t1;",
+    "BEGIN TRAN t1 WITH MARK N'nightly load';\nINSERT INTO t VALUES (1);\nINSERT INTO t VALUES (1);\nCOMMIT;",
+], ids=["one_line", "lowercase", "named", "with_mark"])
+def test_split_statements_begin_tran(batch):
+    """Test that the BEGIN TRAN statement, name and all, is dropped and the rest split."""
+    statements = _split_statements(batch)
+    assert [keyword for keyword, _ in statements] == ["INSERT", "INSERT", "COMMIT"]
+
+def test_split_statements_without_semicolon_after_begin():
+    """Test that a statement sharing a fragment with BEGIN TRANSACTION is kept."""
+    statements = _split_statements("BEGIN TRANSACTION\nINSERT INTO t VALUES (1);\nCOMMIT;")
+    assert [keyword for keyword, _ in statements] == ["INSERT", "COMMIT"]
+
+def test_changes_schema():
+    """Test that DDL and SELECT ... INTO count as schema changes but INSERT INTO doesn't."""
+    assert _changes_schema("CREATE TABLE t (id INT)")
+    assert _changes_schema("EXEC sp_rename 't', 'u'")
+    assert _changes_schema("UPDATE t SET id = 1; SELECT id INTO t2 FROM t")
+    assert not _changes_schema("INSERT INTO t SELECT id FROM u")
+    assert not _changes_schema("SELECT 1\n" * 20000)
+
+def test_is_plain_select():
+    """Test that only SELECTs that can't change session state count as plain."""
+    assert _is_plain_select("-- report\nSELECT name FROM users")
+    assert not _is_plain_select("USE msdb")
+    assert not _is_plain_select("SELECT 1; SET ROWCOUNT 1")
+    assert not _is_plain_select("SELECT id INTO #ids FROM users")
+    assert not _is_plain_select("EXECUTE AS USER = 'reader'")
+    assert not _is_plain_select("UPDATE users SET name = 'x'")
+
+class FakeSchemaCursor:
+    """Minimal stand-in for a cursor that answers the schema query."""
+    def __init__(self, rows):
+        self._rows = rows
+
+    def execute(self, sql):
+        pass
+
+    def fetchall(self):
+        return self._rows
+
+def test_get_schema_keeps_schemas_apart(monkeypatch):
+    """Test that same-named tables in two schemas keep separate column lists."""
+    monkeypatch.setattr("mssql_mcp_server.server._SCHEMA_CACHE", {})
+    config = DbConfig("driver", "server", "user", "password", "db", "connection", "sanitized")
+    cursor = FakeSchemaCursor([
+        ("dbo", "orders", "id"), ("dbo", "orders", "total"),
+        ("sales", "orders", "id"), ("sales", "orders", "region"),
+    ])
+    assert _get_schema(cursor, config) == {
+        ("dbo", "orders"): ["id", "total"],
+        ("sales", "orders"): ["id", "region"],
+    }
+    assert _get_tables(cursor, config) == ["dbo.orders", "sales.orders"]
+
+def test_sanitize_masks_password():
+    """Test that plain and braced passwords are masked in connection strings."""
+    assert _sanitize("UID=sa;PWD=secret;Encrypt=yes;") == "UID=sa;PWD=***;Encrypt=yes;"
+    assert _sanitize("UID=sa;PWD={se;c}}ret};Encrypt=yes;") == "UID=sa;PWD=***;Encrypt=yes;"
+    assert _sanitize("UID=sa;") == "UID=sa;"
+
+def test_result_key_normalizes_query():
+    """Test that comments and keyword case don't change the result cache key."""
+    config = DbConfig("driver", "server", "user", "password", "db", "connection", "sanitized")
+    other_db = DbConfig("driver", "server", "user", "password", "other", "connection", "sanitized")
+    key = _result_key("SELECT name FROM users", config)
+    assert _result_key("-- who\nselect name from users", config) == key
+    assert _result_key("SELECT name FROM users", other_db) != key
+    assert _result_key("SELECT 'Name' FROM users", config) != _result_key("SELECT 'name' FROM users", config)
+
+def test_is_transient_error():
+    """Test transient detection from both the SQLSTATE and the error number in the message."""
+    assert is_transient_error(Exception("42000", "[Microsoft][ODBC Driver] Service is busy (40501)"))
+    assert is_transient_error(Exception("08S01", "[Microsoft][ODBC Driver] Communication link failure"))
+    assert is_transient_error(Exception("Database not currently available (40613)"))
+    assert not is_transient_error(Exception("42000", "Incorrect syntax near 'x'. (102)"))
+    assert not is_transient_error(Exception())
+
+class FakeConnection:
+    """Minimal stand-in for a pyodbc connection that records whether it was closed."""
+    def __init__(self):
+        self.autocommit = False
+        self.closed = False
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def fake_pool(monkeypatch):
+    """Give acquire_conn an empty one-connection pool that opens FakeConnections; yields those opened."""
+    opened = []
+
+    async def connect(connection_string):
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    config = DbConfig("driver", "server", "user", "password", "db", "connection", "sanitized")
+    monkeypatch.setattr("mssql_mcp_server.server.get_db_connection_async", connect)
+    monkeypatch.setattr("mssql_mcp_server.server.get_db_config", lambda: config)
+    monkeypatch.setattr("mssql_mcp_server.server.POOL_SIZE", 1)
+    monkeypatch.setattr("mssql_mcp_server.server._pool", None)
+    monkeypatch.setattr("mssql_mcp_server.server._pool_slots", None)
+    monkeypatch.setattr("mssql_mcp_server.server._pool_open", 0)
+    return opened
+
+async def test_acquire_conn_reuses_connection(fake_pool):
+    """Test that a returned connection is handed to the next caller."""
+    async with acquire_conn() as first:
+        pass
+    async with acquire_conn() as second:
+        pass
+    assert first is second
+    assert len(fake_pool) == 1
+
+async def test_acquire_conn_discards_on_error(fake_pool):
+    """Test that a connection that raised a database error is closed, not reused."""
+    with pytest.raises(Error):
+        async with acquire_conn() as broken:
+            raise Error("08S01", "Communication link failure")
+    assert broken.closed
+    async with acquire_conn() as conn:
+        assert conn is not broken
+
+async def test_acquire_conn_closes_connection_not_reused(fake_pool):
+    """Test that a connection checked out with reuse=False is closed instead of pooled."""
+    async with acquire_conn(reuse=False) as used:
+        pass
+    assert used.closed
+    async with acquire_conn() as conn:
+        assert conn is not used
+
+async def test_acquire_conn_waiter_survives_discard(fake_pool):
+    """Test that a caller waiting for a full pool gets a connection when the holder's is discarded."""
+    holding = asyncio.Event()
+
+    async def fail():
+        async with acquire_conn():
+            holding.set()
+            # Let the second caller start waiting for the slot
+            await asyncio.sleep(0)
+            raise Error("08S01", "Communication link failure")
+
+    async def use():
+        async with acquire_conn() as conn:
+            return conn
+
+    failing = asyncio.create_task(fail())
+    await holding.wait()
+    waiting = asyncio.create_task(use())
+    with pytest.raises(Error):
+        await failing
+    conn = await asyncio.wait_for(waiting, timeout=1)
+    assert conn is fake_pool[1]
+    assert fake_pool[0].closed
+
+async def test_in_thread_finishes_work_before_cancelling():
+    """Test that a cancelled worker call only raises once its thread has finished."""
+    started = threading.Event()
+    release = threading.Event()
+    finished = []
+
+    def work():
+        started.set()
+        release.wait(1)
+        finished.append(True)
+
+    task = asyncio.create_task(_in_thread(work))
+    await asyncio.to_thread(started.wait, 1)
+    task.cancel()
+    await asyncio.sleep(0.01)
+    assert not task.done()
+    release.set()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert finished
+
+@functools.lru_cache(maxsize=1)
 def has_odbc_driver():
-    """Check if the ODBC driver is available."""
+    """Check if the ODBC driver is available; cached since it walks the driver registry."""
     try:
         import pyodbc
         drivers = pyodbc.drivers()
@@ -58,41 +301,48 @@ integration_marker = pytest.mark.skipif(
     reason="ODBC driver not found or database configuration not available"
 )
 
-@pytest.mark.asyncio
-@integration_marker
-async def test_sql_syntax_error():
-    """Test handling of SQL syntax errors with real database."""
-    result = await call_tool("execute_sql", {"query": "SELECTT * FROM sys.tables"})
-    assert len(result) == 1
-    assert "syntax" in result[0].text.lower()
+# Wording that marks a permission failure in an error message
+PERMISSION_ERROR_RE = re.compile(r"permission|privilege|access", re.IGNORECASE)
+
+# Tables the integration tests read and write, created once per session
+FIXTURE_TABLES = {
+    "test_table": "id INT",
+    "test_rollback": "id INT PRIMARY KEY",
+    "test_table1": "id INT",
+    "test_table2": "id INT",
+}
+
+@pytest.fixture(scope="session")
+async def fixture_tables():
+    """Create the integration test tables once for the session and drop them at the end."""
+    await call_tool("execute_sql", {"query": ";\n".join(
+        f"IF OBJECT_ID('{name}', 'U') IS NOT NULL DROP TABLE {name};\n"
+        f"CREATE TABLE {name} ({columns})"
+        for name, columns in FIXTURE_TABLES.items()
+    )})
+    yield
+    await call_tool("execute_sql", {"query": ";\n".join(
+        f"IF OBJECT_ID('{name}', 'U') IS NOT NULL DROP TABLE {name}" for name in FIXTURE_TABLES
+    )})
 
-@pytest.mark.asyncio
 @integration_marker
-async def test_table_not_found_error():
-    """Test handling of missing table errors with real database."""
-    result = await call_tool("execute_sql", {"query": "SELECT * FROM nonexistent_table"})
+@pytest.mark.parametrize("query, expected", [
+    ("SELECTT * FROM sys.tables", "syntax"),
+    ("SELECT * FROM nonexistent_table", "invalid object name"),
+], ids=["syntax_error", "table_not_found"])
+async def test_query_error(query, expected):
+    """Test handling of SQL errors that need no setup with real database."""
+    result = await call_tool("execute_sql", {"query": query})
     assert len(result) == 1
-    assert "invalid object name" in result[0].text.lower()
+    assert expected in result[0].text.lower()
 
-@pytest.mark.asyncio
 @integration_marker
-async def test_column_not_found_error():
+async def test_column_not_found_error(fixture_tables):
     """Test handling of missing column errors with real database."""
-    # First create a test table
-    await call_tool("execute_sql", {"query": """
-        IF OBJECT_ID('test_table', 'U') IS NOT NULL DROP TABLE test_table;
-        CREATE TABLE test_table (id INT);
-    """})
-    
-    # Test invalid column
     result = await call_tool("execute_sql", {"query": "SELECT nonexistent_column FROM test_table"})
     assert len(result) == 1
     assert "invalid column name" in result[0].text.lower()
-    
-    # Cleanup
-    await call_tool("execute_sql", {"query": "DROP TABLE test_table"})
 
-@pytest.mark.asyncio
 @integration_marker
 async def test_permission_error():
     """Test handling of permission errors with real database."""
@@ -110,23 +360,27 @@ async def test_permission_error():
             "GRANT CONNECT TO test_user"  # Only grant connect permission
         ]
         
-        for query in setup_queries:
-            await call_tool("execute_sql", {"query": query})
+        await call_tool("execute_sql", {"query": ";\n".join(setup_queries)})
         
         # Switch to test_user context
         os.environ["MSSQL_USER"] = "test_user"
         os.environ["MSSQL_PASSWORD"] = "TestPass123!"
+        # Drop cached config and pooled connections so the next call logs in as test_user
+        reset_db_config_cache()
+        close_pool()
         
         # Attempt operation that should fail due to permissions
-        result = await call_tool("execute_sql", {"query": "CREATE TABLE test_table (id INT)"})
+        result = await call_tool("execute_sql", {"query": "CREATE TABLE test_permission_table (id INT)"})
         assert len(result) == 1
-        assert any(err in result[0].text.lower() for err in ["permission", "privilege", "access"])
+        assert PERMISSION_ERROR_RE.search(result[0].text)
     finally:
         # Restore original connection info
         if original_user:
             os.environ["MSSQL_USER"] = original_user
         if original_password:
             os.environ["MSSQL_PASSWORD"] = original_password
+        reset_db_config_cache()
+        close_pool()
         
         # Cleanup - use original credentials for cleanup
         cleanup_queries = [
@@ -134,18 +388,13 @@ async def test_permission_error():
             "IF EXISTS (SELECT * FROM sys.database_principals WHERE name = 'test_user') DROP USER test_user"
         ]
         
-        for query in cleanup_queries:
-            await call_tool("execute_sql", {"query": query})
+        await call_tool("execute_sql", {"query": ";\n".join(cleanup_queries)})
 
-@pytest.mark.asyncio
 @integration_marker
-async def test_transaction_rollback():
+async def test_transaction_rollback(fixture_tables):
     """Test handling of transaction rollback with real database."""
-    # Setup - create test table
-    await call_tool("execute_sql", {"query": """
-        IF OBJECT_ID('test_rollback', 'U') IS NOT NULL DROP TABLE test_rollback;
-        CREATE TABLE test_rollback (id INT PRIMARY KEY);
-    """})
+    # Start from an empty table
+    await call_tool("execute_sql", {"query": "TRUNCATE TABLE test_rollback"})
     
     # Test transaction that should fail and rollback
     result = await call_tool("execute_sql", {"query": """
@@ -161,41 +410,47 @@ async def test_transaction_rollback():
     # Verify rollback worked (table should be empty)
     verify_result = await call_tool("execute_sql", {"query": "SELECT COUNT(*) as count FROM test_rollback"})
     assert "0" in verify_result[0].text
-    
-    # Cleanup
-    await call_tool("execute_sql", {"query": "DROP TABLE test_rollback"})
 
-@pytest.mark.asyncio
 @integration_marker
-async def test_list_tables_functionality():
+async def test_list_tables_functionality(fixture_tables):
     """Test list_tables functionality with real database."""
-    # Create test tables
-    setup_queries = [
-        "IF OBJECT_ID('test_table1', 'U') IS NOT NULL DROP TABLE test_table1",
-        "IF OBJECT_ID('test_table2', 'U') IS NOT NULL DROP TABLE test_table2",
-        "CREATE TABLE test_table1 (id INT)",
-        "CREATE TABLE test_table2 (id INT)"
-    ]
-    
-    for query in setup_queries:
-        await call_tool("execute_sql", {"query": query})
-    
-    # Test list_tables
     result = await call_tool("list_tables", {})
     assert len(result) == 1
     assert "test_table1" in result[0].text
     assert "test_table2" in result[0].text
-    
-    # Cleanup
-    cleanup_queries = [
-        "DROP TABLE test_table1",
-        "DROP TABLE test_table2"
-    ]
-    
-    for query in cleanup_queries:
-        await call_tool("execute_sql", {"query": query})
 
-@pytest.mark.asyncio
+@integration_marker
+async def test_same_table_name_in_two_schemas():
+    """Test that same-named tables in two schemas are listed and read separately."""
+    await call_tool("execute_sql", {"query": (
+        "IF OBJECT_ID('test_schema.test_orders', 'U') IS NOT NULL DROP TABLE test_schema.test_orders;\n"
+        "IF OBJECT_ID('test_orders', 'U') IS NOT NULL DROP TABLE test_orders;\n"
+        "IF SCHEMA_ID('test_schema') IS NULL EXEC('CREATE SCHEMA test_schema');\n"
+        "CREATE TABLE test_orders (id INT, total INT);\n"
+        "CREATE TABLE test_schema.test_orders (id INT, region VARCHAR(10))"
+    )})
+    try:
+        result = await read_resource(AnyUrl("mssql://dbo.test_orders/data"))
+        assert result.splitlines()[0] == "id,total"
+        result = await read_resource(AnyUrl("mssql://test_schema.test_orders/data"))
+        assert result.splitlines()[0] == "id,region"
+        tables = (await call_tool("list_tables", {}))[0].text.splitlines()
+        assert "dbo.test_orders" in tables
+        assert "test_schema.test_orders" in tables
+    finally:
+        await call_tool("execute_sql", {"query": (
+            "DROP TABLE test_schema.test_orders;\n"
+            "DROP TABLE test_orders;\n"
+            "DROP SCHEMA test_schema"
+        )})
+
+@integration_marker
+async def test_session_state_not_pooled():
+    """Test that a USE in one call doesn't switch the database for the next call."""
+    await call_tool("execute_sql", {"query": "USE master"})
+    result = await call_tool("execute_sql", {"query": "SELECT DB_NAME() AS name"})
+    assert result[0].text.splitlines()[1] == os.environ["MSSQL_DATABASE"]
+
 @integration_marker
 async def test_list_resources():
     """Test listing resources (requires database connection)."""
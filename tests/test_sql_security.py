@@ -1,15 +1,17 @@
 import pytest
-import pyodbc
-import ssl
 import os
 from mssql_mcp_server.server import get_db_config
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def db_connection():
-    """Fixture to provide database connection."""
+    """Fixture to provide one database connection shared by the whole session.
+    
+    The tests only read DMVs, so autocommit avoids opening implicit transactions.
+    """
+    import pyodbc
+    
     try:
-        _, connection_string = get_db_config()
-        conn = pyodbc.connect(connection_string)
+        conn = pyodbc.connect(get_db_config().connection_string, autocommit=True)
         yield conn
         conn.close()
     except ValueError as e:
@@ -17,12 +19,11 @@ def db_connection():
     except pyodbc.Error as e:
         pytest.skip(f"Database connection error: {str(e)}")
 
-def test_tls_version_and_cipher(db_connection):
-    """Test that the connection uses TLS 1.2 or higher with secure cipher suites."""
+@pytest.fixture(scope="session")
+def conn_dmv(db_connection):
+    """Fixture to provide this session's connection and session DMV row, fetched once."""
     cursor = db_connection.cursor()
-    
-    # Check TLS version and cipher details using DMV
-    tls_result = cursor.execute("""
+    row = cursor.execute("""
         SELECT 
             c.encrypt_option,
             c.protocol_type,
@@ -33,10 +34,21 @@ def test_tls_version_and_cipher(db_connection):
             c.client_net_address,
             c.client_tcp_port,
             c.local_net_address,
-            c.local_tcp_port
+            c.local_tcp_port,
+            s.ansi_nulls,
+            s.quoted_identifier,
+            s.arithabort
         FROM sys.dm_exec_connections c
+        JOIN sys.dm_exec_sessions s ON c.session_id = s.session_id
         WHERE c.session_id = @@SPID
     """).fetchone()
+    cursor.close()
+    return row
+
+def test_tls_version_and_cipher(db_connection, conn_dmv):
+    """Test that the connection uses TLS 1.2 or higher with secure cipher suites."""
+    tls_result = conn_dmv
+    cursor = db_connection.cursor()
     
     # Check for disabled protocols
     disabled_protocols = cursor.execute("""
@@ -68,12 +80,16 @@ def test_tls_version_and_cipher(db_connection):
     
     cursor.close()
 
-def test_connection_properties():
-    """Test that required secure connection properties are set."""
-    config, connection_string = get_db_config()
-    
-    # Parse connection string to check security properties
+@pytest.fixture(scope="session")
+def parsed_conn_props():
+    """Fixture to provide the connection string and its parsed properties, built once per session."""
+    connection_string = get_db_config().connection_string
     conn_props = dict(prop.split('=', 1) for prop in connection_string.split(';') if '=' in prop)
+    return connection_string, conn_props
+
+def test_connection_properties(parsed_conn_props):
+    """Test that required secure connection properties are set."""
+    connection_string, conn_props = parsed_conn_props
     
     # Get expected trust certificate setting from environment
     trust_server_cert = os.getenv("MSSQL_TRUST_SERVER_CERTIFICATE", "").lower() != "no"
@@ -88,21 +104,9 @@ def test_connection_properties():
     assert 'ApplicationIntent=ReadWrite' in connection_string, "ApplicationIntent is not set to ReadWrite"
     assert conn_props.get('Protocol', '').upper() == 'TCP', "Protocol must be set to TCP"
 
-def test_authentication_security(db_connection):
+def test_authentication_security(conn_dmv):
     """Test authentication and session security settings."""
-    cursor = db_connection.cursor()
-    
-    # Check authentication and session settings
-    auth_result = cursor.execute("""
-        SELECT 
-            c.auth_scheme,
-            s.ansi_nulls,
-            s.quoted_identifier,
-            s.arithabort
-        FROM sys.dm_exec_connections c
-        JOIN sys.dm_exec_sessions s ON c.session_id = s.session_id
-        WHERE c.session_id = @@SPID
-    """).fetchone()
+    auth_result = conn_dmv
     
     # Verify authentication scheme
     assert auth_result.auth_scheme in ['SQL', 'NTLM', 'KERBEROS'], "Unsupported authentication scheme"
@@ -110,5 +114,3 @@ def test_authentication_security(db_connection):
     # Verify secure session properties
     assert auth_result.ansi_nulls == 1, "ANSI_NULLS must be enabled"
     assert auth_result.quoted_identifier == 1, "QUOTED_IDENTIFIER must be enabled"
-    
-    cursor.close() 
\ No newline at end of file